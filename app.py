@@ -1,25 +1,26 @@
 import streamlit as st
+import tempfile
+import os
 from datetime import datetime
-from audio_processing.audio_handler import transcribe_audio, get_audio_info
-from io import BytesIO
-from audio_processing.diagnosis_generation import generate_diagnosis_from_transcript, create_word_document
-from ocr_handler.ocr_handler import batch_extract_from_images
 from ocr_handler.source_manager import (
     initialize_source_manager,
-    add_source,
+    add_sources_bulk,
     get_all_sources,
-    get_confirmed_sources,
-    all_sources_confirmed,
-    get_source_summary,
+    get_source_by_id,
+    get_source_state,
     get_combined_text,
     bulk_confirm_all,
     open_review_modal,
     confirm_source,
-    close_review_modal
+    close_review_modal,
+    STATUS_PENDING,
+    STATUS_CONFIRMED
 )
 from ocr_handler.review_modal import show_review_modal
 from chatbot_handler.chatbot_handler import initialize_chatbot
 from chatbot_handler.chatbot_ui import render_chatbot_inline
+from utils.styles import inject_styles, render_disclaimer
+from utils.hashing import save_by_sha256, uploaded_file_sha256
 
 # ============================================================================
 # PAGE CONFIGURATION
@@ -36,50 +37,115 @@ st.set_page_config(
 initialize_source_manager()
 initialize_chatbot()
 
-if 'initial_diagnosis' not in st.session_state:
-    st.session_state.initial_diagnosis = None
-if 'final_diagnosis' not in st.session_state:
-    st.session_state.final_diagnosis = None
-if 'ready_for_download' not in st.session_state:
-    st.session_state.ready_for_download = False
-if 'show_chat' not in st.session_state:
-    st.session_state.show_chat = False
+_DEFAULTS = {
+    'initial_diagnosis': None,
+    'final_diagnosis': None,
+    'ready_for_download': False,
+    'show_chat': False,
+}
+
+for key, value in _DEFAULTS.items():
+    st.session_state.setdefault(key, value)
 
 # ============================================================================
 # CUSTOM CSS
 # ============================================================================
-st.markdown("""
-    <style>
-    .block-container {
-        padding-top: 3rem !important; 
-        padding-bottom: 2rem !important;
-    }
-    .greeting {
-        font-size: 4rem !important;
-        color: #1f77b4;
-        font-weight: 800;
-        margin-bottom: 0px;
-        line-height: 1.2;
-    }
-    .sub-greeting {
-        font-size: 1.8rem !important;
-        color: #4a4a4a;
-        font-weight: 300;
-        margin-top: 0px;
-        margin-bottom: 3rem;
-    }
-    .disclaimer-box {
-        margin-top: 3rem;
-        padding: 1rem;
-        background-color: #fff3cd;
-        border: 1px solid #ffeeba;
-        color: #856404;
-        border-radius: 0.25rem;
-        font-size: 0.9rem;
-        text-align: center;
+inject_styles()
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+def show_report(label, text, height=500):
+    """
+    Read-only, scrollable view of a long report
+    
+    Renders as plain <pre> text instead of a disabled text_area, so no
+    widget state is kept or diffed for multi-KB reports on each rerun.
+    
+    Args:
+        label: Caption shown above the report
+        text: Report text
+        height: Scroll container height in pixels
+    """
+    st.caption(label)
+    with st.container(height=height, border=True):
+        st.code(text, language=None, wrap_lines=True)
+
+
+def show_diagnosis_versions(current_name):
+    """
+    Current/original diagnosis tabs after chat modifications
+    
+    Shared by the review (STEP 5) and download (STEP 7) views, which are
+    never shown on the same rerun, so each report is sent once.
+    
+    Args:
+        current_name: Name for the modified version ("Current" or "Final")
+    """
+    tab1, tab2 = st.tabs([f"{current_name} Version", "Original Version"])
+    
+    with tab1:
+        show_report(f"{current_name} Diagnosis", st.session_state.final_diagnosis)
+    
+    with tab2:
+        show_report("Original Diagnosis", st.session_state.initial_diagnosis)
+
+
+def progress_log():
+    """
+    Cumulative progress log drawn in a single placeholder
+    
+    Each update rewrites one element instead of appending a new one per
+    message, so a batch adds a single node to the status panel.
+    
+    Returns:
+        function: log(*lines) that appends markdown lines and redraws
+    """
+    placeholder = st.empty()
+    log_lines = []
+    
+    def log(*lines):
+        log_lines.extend(lines)
+        placeholder.markdown("  \n".join(log_lines))
+    
+    return log
+
+
+def batch_progress(total, noun):
+    """
+    Progress bar advanced once per finished item
+    
+    Args:
+        total: Number of items in the batch
+        noun: Item name for the bar text (e.g. "file")
+        
+    Returns:
+        tuple: (advance() to call per finished item, the st.progress element)
+    """
+    bar = st.progress(0.0, text=f"0 of {total} {noun}(s) done")
+    done = [0]
+    
+    def advance():
+        done[0] += 1
+        bar.progress(done[0] / total, text=f"{done[0]} of {total} {noun}(s) done")
+    
+    return advance, bar
+
+
+def upload_sha256(uploaded_file):
+    """Content hash of an upload, computed once per file_id"""
+    hashes = st.session_state.setdefault('upload_hashes', {})
+    if uploaded_file.file_id not in hashes:
+        hashes[uploaded_file.file_id] = uploaded_file_sha256(uploaded_file)
+    return hashes[uploaded_file.file_id]
+
+
+def existing_content(source_type):
+    """Content hashes of sources already added for a source type"""
+    return {
+        s['metadata']['content_hash'] for s in get_all_sources()
+        if s['type'] == source_type and s['metadata'].get('content_hash')
     }
-    </style>
-""", unsafe_allow_html=True)
 
 # ============================================================================
 # HEADER
@@ -90,10 +156,6 @@ st.markdown('<div class="sub-greeting">Let\'s get started.</div>', unsafe_allow_
 # ============================================================================
 # STEP 1: AUDIO UPLOAD & TRANSCRIPTION (DISK-STREAMING, NO FFMPEG)
 # ============================================================================
-import tempfile
-import os
-from io import BytesIO
-
 st.write("### 1. Consultation Audio")
 st.caption("Upload audio recordings of patient consultations")
 
@@ -110,29 +172,35 @@ audio_files = st.file_uploader(
     help="Can upload multiple files. Each should be <100MB for best results"
 )
 
-# Stream uploads to disk
-if audio_files:
-    new_files_added = False
+# Stream uploads to disk, only when the uploader's file set changed
+# (saved entries render below in the same run, no rerun needed)
+upload_signature = tuple(f.file_id for f in audio_files or ())
+
+if audio_files and upload_signature != st.session_state.get('audio_upload_signature'):
+    # Imported on use: pulls in the OpenAI SDK
+    from audio_processing.audio_handler import get_audio_info
+    
+    saved_names = {f['name'] for f in st.session_state.audio_files_ready}
+    
     for uploaded_file in audio_files:
         # Skip if already saved
-        if not any(f['name'] == uploaded_file.name for f in st.session_state.audio_files_ready):
-            temp_path = os.path.join(tempfile.gettempdir(), uploaded_file.name)
+        if uploaded_file.name not in saved_names:
+            # Write the in-memory upload straight to disk, named by its hash
+            temp_path, content_hash = save_by_sha256(uploaded_file, tempfile.gettempdir())
             
-            # Write in 10MB chunks to avoid memory overflow
-            with open(temp_path, 'wb') as f:
-                while chunk := uploaded_file.read(10 * 1024 * 1024):
-                    f.write(chunk)
+            # Metadata is read once here and kept with the saved file
+            audio_info = get_audio_info(uploaded_file)
             
             st.session_state.audio_files_ready.append({
                 'name': uploaded_file.name,
                 'path': temp_path,
-                'size': os.path.getsize(temp_path)
+                'size': os.path.getsize(temp_path),
+                'mime_type': audio_info['type'],
+                'content_hash': content_hash
             })
-            new_files_added = True
+            saved_names.add(uploaded_file.name)
     
-    # Only rerun if new files were added
-    if new_files_added:
-        st.rerun()
+    st.session_state.audio_upload_signature = upload_signature
 
 # Display uploaded files
 if st.session_state.audio_files_ready:
@@ -147,67 +215,82 @@ if st.session_state.audio_files_ready:
         size_mb = file_info['size'] / 1024 / 1024
         st.caption(f"🎙️ {file_info['name']} - {size_mb:.1f} MB")
     
-    # Check if already transcribed
-    filenames = [f['name'] for f in st.session_state.audio_files_ready]
-    existing_audio = [s for s in get_all_sources() if s['type'] == 'audio' and s['filename'] in filenames]
+    # Check if already transcribed (by content, so renamed copies count too)
+    # One hash set serves both the notice and the skip check
+    existing = existing_content('audio')
+    existing_audio = sum(
+        1 for f in st.session_state.audio_files_ready if f.get('content_hash') in existing
+    )
     
     if existing_audio:
-        st.info(f"ℹ️ {len(existing_audio)} audio file(s) already transcribed. See sources below.")
+        st.info(f"ℹ️ {existing_audio} audio file(s) already transcribed. See sources below.")
     
     # Transcription Button
     if st.button("🎙️ Transcribe Audio Files", key="audio_transcribe_btn", type="primary"):
         
-        status_container = st.status("🎙️ Transcribing audio...", expanded=True)
+        # Skip files that were already transcribed
+        files_to_process = []
+        skipped = []
+        for file_info in st.session_state.audio_files_ready:
+            if file_info.get('content_hash') in existing:
+                skipped.append(f"⏭️ Skipping {file_info['name']} (already transcribed)")
+            else:
+                files_to_process.append(file_info)
+        
+        # Collapsed panel keeps the per-file log; the bar shows progress
+        advance, progress_bar = batch_progress(len(files_to_process), "file")
+        status_container = st.status("🎙️ Transcribing audio...", expanded=False)
         
         with status_container:
-            st.write(f"🎤 Processing {len(st.session_state.audio_files_ready)} audio file(s)...")
+            log = progress_log()
+            log(f"🎤 Processing {len(st.session_state.audio_files_ready)} audio file(s)...", *skipped)
             
-            for file_info in st.session_state.audio_files_ready:
-                filename = file_info['name']
-                file_path = file_info['path']
+            def on_transcribed(file_info, result):
+                """Log each file as soon as it finishes"""
+                filename = result['filename']
                 
-                # Skip if already transcribed
-                if any(s['filename'] == filename for s in get_all_sources()):
-                    st.write(f"   ⏭️ Skipping {filename} (already transcribed)")
-                    continue
-                
-                st.write(f"   Processing: {filename}")
-                
-                try:
-                    # Read file from disk
-                    with open(file_path, 'rb') as f:
-                        audio_bytes = f.read()
-                    
-                    # Create file-like object for Whisper
-                    fake_file = BytesIO(audio_bytes)
-                    fake_file.name = filename
-                    fake_file.size = len(audio_bytes)
-                    fake_file.type = 'audio/mpeg'
-                    
-                    # Transcribe
-                    transcript_text = transcribe_audio(fake_file)
-                    
-                    if transcript_text:
-                        add_source(
-                            source_type="audio",
-                            filename=filename,
-                            raw_text=transcript_text,
-                            metadata={
-                                'size_mb': round(file_info['size']/1024/1024, 2),
-                                'file_type': 'audio'
-                            }
-                        )
-                        st.write(f"   ✅ Transcribed: {len(transcript_text.split())} words")
-                    else:
-                        st.error(f"   ❌ No transcript returned for {filename}")
+                if result['status'] == 'success' and result['transcript']:
+                    log(f"✅ {filename}: {result['word_count']} words")
+                elif result['status'] == 'success':
+                    log(f"❌ No transcript returned for {filename}")
+                else:
+                    log(f"❌ Error processing {filename}: {result['error']}")
                 
-                except Exception as e:
-                    st.error(f"   ❌ Error processing {filename}: {str(e)}")
+                advance()
+            
+            # Transcribe all remaining files concurrently
+            from audio_processing.audio_handler import batch_transcribe_audio
             
-            status_container.update(label="✅ Transcription Complete!", state="complete", expanded=False)
+            results = batch_transcribe_audio(files_to_process, on_complete=on_transcribed)
+            
+            # Add all transcripts together, in upload order
+            transcribed = add_sources_bulk([
+                {
+                    "source_type": "audio",
+                    "filename": result['filename'],
+                    "raw_text": result['transcript'],
+                    "metadata": {
+                        'size_mb': round(file_info['size']/1024/1024, 2),
+                        'file_type': 'audio',
+                        'mime_type': file_info.get('mime_type'),
+                        'content_hash': file_info.get('content_hash'),
+                        'word_count': result['word_count']
+                    }
+                }
+                for file_info, result in zip(files_to_process, results)
+                if result['status'] == 'success' and result['transcript']
+            ])
+            
+            status_container.update(
+                label=f"✅ Transcription Complete! {len(transcribed)} of {len(files_to_process)} file(s) transcribed",
+                state="complete",
+                expanded=False
+            )
+        
+        progress_bar.empty()
         
+        # No rerun: the source list below renders the new sources in this run
         st.success("🎉 Audio transcription complete! Review sources below.")
-        st.rerun()
 
 st.markdown("---")
 
@@ -242,11 +325,11 @@ if add_medical_file == 'Yes':
             st.caption(f"📎 {file.name}")
         
         # Check if already processed
-        ocr_filenames = [f.name for f in ocr_files]
-        existing_ocr = [s for s in get_all_sources() if s['type'] == 'ocr' and s['filename'] in ocr_filenames]
+        existing = existing_content('ocr')
+        existing_ocr = sum(1 for f in ocr_files if upload_sha256(f) in existing)
         
         if existing_ocr:
-            st.info(f"ℹ️ {len(existing_ocr)} document(s) already processed. See sources below.")
+            st.info(f"ℹ️ {existing_ocr} document(s) already processed. See sources below.")
         
         # OCR Extract Button
         if st.button("🔍 Extract Text from Documents", key="ocr_extract_btn", type="primary"):
@@ -257,52 +340,92 @@ if add_medical_file == 'Yes':
                 st.error("❌ OpenRouter API key not found in secrets. Please add it in Streamlit Cloud settings.")
                 st.stop()
             
-            status_container = st.status("📄 Processing documents...", expanded=True)
+            # Filter out already processed files
+            files_to_process = [f for f in ocr_files if upload_sha256(f) not in existing]
+            
+            # Collapsed panel keeps the per-file log; the bar shows progress
+            advance, progress_bar = batch_progress(len(files_to_process), "document")
+            status_container = st.status("📄 Processing documents...", expanded=False)
+            extracted = []
             
             with status_container:
-                st.write(f"🔍 Extracting text from {len(ocr_files)} document(s)...")
-                
-                # Filter out already processed files
-                files_to_process = [f for f in ocr_files if not any(s['filename'] == f.name for s in get_all_sources())]
+                log = progress_log()
+                log(f"🔍 Extracting text from {len(ocr_files)} document(s)...")
                 
                 if not files_to_process:
                     st.info("All files already processed!")
                 else:
-                    ocr_results = batch_extract_from_images(files_to_process, OPENROUTER_API_KEY, mode="full")
+                    # Imported on use: only needed when OCR actually runs
+                    from ocr_handler.ocr_handler import batch_extract_from_images
                     
-                    for result in ocr_results:
+                    def on_extracted(result):
+                        """Log each document as soon as its OCR finishes"""
                         if result['status'] == 'success':
-                            add_source(
-                                source_type="ocr",
-                                filename=result['filename'],
-                                raw_text=result['extracted_text'],
-                                metadata={
-                                    'file_size_kb': result.get('file_size_kb', 0),
-                                    'word_count': result['word_count']
-                                }
-                            )
-                            st.write(f"   ✅ {result['filename']}: {result['word_count']} words")
+                            log(f"✅ {result['filename']}: {result['word_count']} words")
                         else:
-                            st.error(f"   ❌ {result['filename']}: {result['error']}")
+                            log(f"❌ {result['filename']}: {result['error']}")
+                        
+                        advance()
+                    
+                    ocr_results = batch_extract_from_images(
+                        files_to_process, OPENROUTER_API_KEY, mode="full", on_complete=on_extracted
+                    )
+                    
+                    # Add all documents together, in upload order. Results
+                    # come back in input order, so each is paired with its
+                    # own file's hash (names can repeat, e.g. image.jpg)
+                    extracted = add_sources_bulk([
+                        {
+                            "source_type": "ocr",
+                            "filename": result['filename'],
+                            "raw_text": result['extracted_text'],
+                            "metadata": {
+                                'file_size_kb': result.get('file_size_kb', 0),
+                                'word_count': result['word_count'],
+                                'content_hash': upload_sha256(f)
+                            }
+                        }
+                        for f, result in zip(files_to_process, ocr_results)
+                        if result['status'] == 'success'
+                    ])
                 
-                status_container.update(label="✅ OCR Complete!", state="complete", expanded=False)
+                status_container.update(
+                    label=f"✅ OCR Complete! {len(extracted)} of {len(files_to_process)} document(s) extracted",
+                    state="complete",
+                    expanded=False
+                )
+            
+            progress_bar.empty()
             
             st.success("🎉 Document extraction complete! Review sources below.")
-            st.rerun()
 
 st.markdown("---")
 
 # ============================================================================
 # STEP 3: REVIEW & CONFIRM SOURCES
 # ============================================================================
-sources = get_all_sources()
+def rerun_after_confirm():
+    """Rerun only the source list, or the whole app once every source is confirmed"""
+    st.rerun(scope="app" if get_source_state().all_confirmed else "fragment")
+
 
-if sources:
+@st.fragment
+def sources_fragment():
+    """
+    Render the source review list
+    
+    Confirm clicks rerun only this fragment instead of the whole script
+    (uploaders, transcription and diagnosis steps stay untouched).
+    """
+    sources, summary, _, _ = get_source_state()
+    
+    if not sources:
+        return
+    
     st.write("### 3. Review Data Sources")
     st.caption("Review extracted text and make corrections before generating diagnosis")
     
     # Summary metrics
-    summary = get_source_summary()
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Total Sources", summary['total_sources'])
     col2.metric("✅ Confirmed", summary['confirmed'])
@@ -325,38 +448,64 @@ if sources:
     
     st.markdown("---")
     
-    # List all sources
-    for source in sources:
-        col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
-        
-        with col1:
-            if source['status'] == 'confirmed':
-                icon = "✅"
-                status_text = "Confirmed"
-                status_color = "green"
-            else:
-                icon = "⏳"
-                status_text = "Pending Review"
-                status_color = "orange"
-            
-            st.markdown(f"{icon} **{source['filename']}** ({source['type'].upper()}) - :{status_color}[{status_text}]")
-            st.caption(f"{source['word_count']} words | Added: {source['created_at']}")
-        
-        with col2:
-            st.metric("Words", source['word_count'])
-        
-        with col3:
-            if st.button("👁️ Review", key=f"review_btn_{source['id']}", use_container_width=True):
-                open_review_modal(source['id'])
-                st.rerun()
-        
-        with col4:
-            if source['status'] == 'pending':
-                if st.button("✅", key=f"quick_confirm_{source['id']}", use_container_width=True, help="Quick confirm"):
-                    confirm_source(source['id'])
-                    st.rerun()
+    # One table instead of a row of columns and buttons per source
+    table = st.dataframe(
+        [
+            {
+                "Status": "✅ Confirmed" if source['status'] == STATUS_CONFIRMED else "⏳ Pending Review",
+                "File": source['filename'],
+                "Type": source['type'].upper(),
+                "Words": source['word_count'],
+                "Added": source['created_at']
+            }
+            for source in sources
+        ],
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="multi-row",
+        key="sources_table"
+    )
+    
+    # Selected rows are positions in the table as last shown; map them
+    # through that table's source IDs, so a discard since then can't
+    # shift them onto other sources or past the end of the list
+    shown_ids = st.session_state.get('sources_table_ids', [])
+    selected = [
+        source
+        for source in (get_source_by_id(shown_ids[i]) for i in table.selection.rows if i < len(shown_ids))
+        if source is not None
+    ]
+    st.session_state.sources_table_ids = [source['id'] for source in sources]
+    selected_pending = [source for source in selected if source['status'] == STATUS_PENDING]
+    
+    col1, col2, col3 = st.columns([1, 1, 2])
+    
+    with col1:
+        if st.button("👁️ Review Selected", key="review_selected_btn", use_container_width=True,
+                     disabled=len(selected) != 1, help="Select one row to review"):
+            open_review_modal(selected[0]['id'])
+            st.rerun()
+    
+    with col2:
+        if st.button("✅ Confirm Selected", key="confirm_selected_btn", use_container_width=True,
+                     disabled=not selected_pending):
+            for source in selected_pending:
+                confirm_source(source['id'])
+            rerun_after_confirm()
+    
+    with col3:
+        st.caption("Select rows in the table to review or confirm them")
     
     st.markdown("---")
+    
+    # Pending notice lives here so quick-confirms keep the count current
+    if summary['pending'] > 0:
+        st.warning(f"⚠️ Please review and confirm all sources ({summary['pending']} pending)")
+        st.button("🔬 Generate Initial Diagnosis", disabled=True, key="gen_diagnosis_disabled")
+
+
+sources_fragment()
 
 # Show review modal (ONLY if review_mode is set)
 if st.session_state.get('review_mode') is not None:
@@ -365,20 +514,24 @@ if st.session_state.get('review_mode') is not None:
 # ============================================================================
 # STEP 4: GENERATE INITIAL DIAGNOSIS
 # ============================================================================
-if sources and all_sources_confirmed():
+sources, summary, confirmed_sources, sources_confirmed = get_source_state()
+
+if sources_confirmed:
     st.success("### 🎉 All Sources Confirmed!")
     
+    # Built once here; shared by the preview and the diagnosis request
+    combined = get_combined_text()
+    
     # Summary preview
     with st.expander("📊 View Combined Data Summary", expanded=False):
         st.write("**Sources Ready for Diagnosis:**")
-        for source in get_confirmed_sources():
+        for source in confirmed_sources:
             st.write(f"✅ **{source['filename']}** ({source['type'].upper()}) - {source['word_count']} words")
         
         st.markdown("---")
         st.write(f"**Total Input:** {summary['total_words']} words across {summary['confirmed']} source(s)")
         
-        combined = get_combined_text()
-        st.text_area("Combined Text Preview", combined, height=300, disabled=True, key="combined_preview")
+        show_report("Combined Text Preview", combined, height=300)
     
     st.markdown("---")
     
@@ -389,11 +542,16 @@ if sources and all_sources_confirmed():
             status_container = st.status("🧠 Generating initial diagnosis...", expanded=True)
             
             with status_container:
-                st.write("📝 Combining all confirmed sources...")
-                combined_input = get_combined_text()
-                
                 st.write("🤖 Sending to AI for analysis...")
-                initial_diagnosis = generate_diagnosis_from_transcript(combined_input)
+                try:
+                    # Imported on use: pulls in python-docx and the OpenAI client
+                    from audio_processing.diagnosis_generation import generate_diagnosis_stream
+                    
+                    # Render tokens as they arrive; returns the full report
+                    initial_diagnosis = st.write_stream(generate_diagnosis_stream(combined))
+                except Exception as e:
+                    st.error(f"❌ Diagnosis generation failed: {str(e)}")
+                    initial_diagnosis = None
                 
                 if initial_diagnosis:
                     st.write("✅ Initial diagnosis generated!")
@@ -407,10 +565,6 @@ if sources and all_sources_confirmed():
             
             st.rerun()
 
-elif sources:
-    st.warning(f"⚠️ Please review and confirm all sources ({get_source_summary()['pending']} pending)")
-    st.button("🔬 Generate Initial Diagnosis", disabled=True, key="gen_diagnosis_disabled")
-
 # ============================================================================
 # STEP 5: DISPLAY INITIAL DIAGNOSIS
 # ============================================================================
@@ -421,35 +575,10 @@ if st.session_state.initial_diagnosis and not st.session_state.get('ready_for_do
     # Show diagnosis with comparison if modified
     if st.session_state.get('chat_modifications'):
         st.info(f"✏️ Diagnosis has been modified {len(st.session_state.chat_modifications)} time(s)")
-        
-        tab1, tab2 = st.tabs(["Current Version", "Original Version"])
-        
-        with tab1:
-            st.text_area(
-                "Current Diagnosis",
-                st.session_state.final_diagnosis,
-                height=500,
-                disabled=True,
-                key="current_diag_display"
-            )
-        
-        with tab2:
-            st.text_area(
-                "Original Diagnosis",
-                st.session_state.initial_diagnosis,
-                height=500,
-                disabled=True,
-                key="original_diag_display"
-            )
+        show_diagnosis_versions("Current")
     else:
         # No modifications yet, show single view
-        st.text_area(
-            "Diagnostic Report", 
-            st.session_state.initial_diagnosis, 
-            height=500,
-            disabled=True,
-            key="single_diag_display"
-        )
+        show_report("Diagnostic Report", st.session_state.initial_diagnosis)
     
     st.markdown("---")
     
@@ -485,47 +614,14 @@ if st.session_state.show_chat and st.session_state.initial_diagnosis and not st.
 # ============================================================================
 # STEP 7: DOWNLOAD OPTIONS
 # ============================================================================
-if st.session_state.get('ready_for_download') and st.session_state.final_diagnosis:
-    st.markdown("---")
-    st.success("### 🎉 Diagnosis Finalized!")
+@st.fragment
+def download_fragment():
+    """
+    Render the download buttons
     
-    # Show final diagnosis
-    with st.expander("📋 View Final Diagnosis", expanded=True):
-        
-        # If modifications were made, show comparison
-        if st.session_state.get('chat_modifications'):
-            st.info(f"✏️ {len(st.session_state.chat_modifications)} modification(s) made via AI chat")
-            
-            tab1, tab2 = st.tabs(["Final Version", "Original Version"])
-            
-            with tab1:
-                st.text_area(
-                    "Final Diagnosis",
-                    st.session_state.final_diagnosis,
-                    height=500,
-                    disabled=True,
-                    key="final_diag_display"
-                )
-            
-            with tab2:
-                st.text_area(
-                    "Original Diagnosis",
-                    st.session_state.initial_diagnosis,
-                    height=500,
-                    disabled=True,
-                    key="original_diag_compare"
-                )
-        else:
-            # No modifications
-            st.text_area(
-                "Final Diagnosis",
-                st.session_state.final_diagnosis,
-                height=500,
-                disabled=True,
-                key="final_diag_only"
-            )
-    
-    st.markdown("---")
+    A download click reruns only this fragment, not the report views
+    and chat state above it.
+    """
     st.write("### 📥 Download Options")
     
     col1, col2, col3 = st.columns(3)
@@ -552,10 +648,19 @@ if st.session_state.get('ready_for_download') and st.session_state.final_diagnos
         )
     
     with col3:
-        word_doc = create_word_document(
-            st.session_state.final_diagnosis,
-            transcript=combined_sources
-        )
+        # Build the DOCX once per (report, sources) pair, not on every rerun
+        doc_key = hash((st.session_state.final_diagnosis, combined_sources))
+        
+        if st.session_state.get('word_doc_key') != doc_key:
+            from audio_processing.diagnosis_generation import create_word_document
+            
+            st.session_state.word_doc = create_word_document(
+                st.session_state.final_diagnosis,
+                transcript=combined_sources
+            )
+            st.session_state.word_doc_key = doc_key
+        
+        word_doc = st.session_state.word_doc
         
         if word_doc:
             st.download_button(
@@ -566,6 +671,26 @@ if st.session_state.get('ready_for_download') and st.session_state.final_diagnos
                 use_container_width=True,
                 key="download_word"
             )
+
+
+if st.session_state.get('ready_for_download') and st.session_state.final_diagnosis:
+    st.markdown("---")
+    st.success("### 🎉 Diagnosis Finalized!")
+    
+    # Show final diagnosis
+    with st.expander("📋 View Final Diagnosis", expanded=True):
+        
+        # If modifications were made, show comparison
+        if st.session_state.get('chat_modifications'):
+            st.info(f"✏️ {len(st.session_state.chat_modifications)} modification(s) made via AI chat")
+            show_diagnosis_versions("Final")
+        else:
+            # No modifications
+            show_report("Final Diagnosis", st.session_state.final_diagnosis)
+    
+    st.markdown("---")
+    
+    download_fragment()
     
     st.markdown("---")
     
@@ -578,11 +703,4 @@ if st.session_state.get('ready_for_download') and st.session_state.final_diagnos
 # ============================================================================
 # DISCLAIMER
 # ============================================================================
-st.markdown("""
-<div class="disclaimer-box">
-    <strong>⚠️ DISCLAIMER: AI-Assisted Diagnosis</strong><br>
-    This diagnosis is generated by Artificial Intelligence and is subject to potential inaccuracies. 
-    It is designed to function <strong>solely as a decision support tool</strong>. 
-    It does not replace professional medical judgment. 
-</div>
-""", unsafe_allow_html=True)
+render_disclaimer()
@@ -3,14 +3,30 @@ Audio transcription using OpenAI Whisper API
 """
 
 from openai import OpenAI
-import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import streamlit as st
+from utils.hashing import file_sha256, uploaded_file_sha256
+from utils.backoff import retry
+
+# Upper bound on simultaneous Whisper requests (API rate limits);
+# override with TRANSCRIBE_CONCURRENCY for accounts with other limits
+MAX_CONCURRENT_TRANSCRIPTIONS = max(1, int(os.environ.get("TRANSCRIBE_CONCURRENCY", "8")))
+
+# Speech-to-text model (part of the transcript cache key)
+WHISPER_MODEL = "whisper-1"
+
+# Transcript cache bounds: entries kept (oldest evicted first) and
+# seconds each entry lives, so patient text doesn't linger in memory
+MAX_CACHED_TRANSCRIPTS = 500
+TRANSCRIPT_CACHE_TTL = 3600
 
 @st.cache_resource
 def get_openai_client():
     """Initialize OpenAI client with API key from secrets"""
-    return OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+    # SDK retries off: calls are wrapped in utils.backoff.retry, so only
+    # one retry policy (and one backoff schedule) applies
+    return OpenAI(api_key=st.secrets["OPENAI_API_KEY"], max_retries=0)
 
 def transcribe_audio(audio_file):
     """
@@ -25,30 +41,136 @@ def transcribe_audio(audio_file):
     try:
         client = get_openai_client()
         
-        # Create temporary file (Whisper API needs file path)
-        file_extension = os.path.splitext(audio_file.name)[1]
+        # The SDK takes (filename, bytes) directly, no temp file needed;
+        # the filename keeps the extension Whisper uses to detect the format
+        return _transcribe_cached(
+            uploaded_file_sha256(audio_file),
+            WHISPER_MODEL,
+            client,
+            (audio_file.name, audio_file.getvalue())
+        )
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
-            # Write uploaded file to temp location
-            tmp_file.write(audio_file.getvalue())
-            tmp_file_path = tmp_file.name
+    except Exception as e:
+        st.error(f"❌ Transcription failed: {str(e)}")
+        return None
+
+@st.cache_data(max_entries=MAX_CACHED_TRANSCRIPTS, ttl=TRANSCRIPT_CACHE_TTL, show_spinner=False)
+def _transcribe_cached(content_hash, model, _client, _audio):
+    """
+    Whisper call cached in memory by audio content hash and model
+    
+    Identical audio (even renamed or re-uploaded) is not sent to the
+    API again. Nothing is written to disk: entries live only in this
+    server process. A hit needs the exact same audio bytes, so a session
+    can only get back text for a file it uploaded itself. Transient
+    errors are retried with backoff; errors that remain raise, so
+    failures are never cached.
+    Underscore arguments are excluded from the cache key.
+    
+    Args:
+        content_hash: SHA-256 of the audio file
+        model: Whisper model name
+        _client: OpenAI client
+        _audio: Path to a saved audio file, or a (filename, bytes) tuple
         
-        # Transcribe using Whisper
-        with open(tmp_file_path, 'rb') as audio:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
+    Returns:
+        str: Transcribed text
+    """
+    def request():
+        if isinstance(_audio, tuple):
+            return _client.audio.transcriptions.create(
+                model=model,
+                file=_audio,
+                response_format="text"
+            )
+        
+        # Reopened per attempt: a failed upload consumes the file object
+        with open(_audio, 'rb') as audio:
+            return _client.audio.transcriptions.create(
+                model=model,
                 file=audio,
                 response_format="text"
             )
+    
+    return retry(request)
+
+
+def _transcribe_file(client, file_info):
+    """
+    Transcribe one audio file from disk (runs in a worker thread)
+    
+    Args:
+        client: OpenAI client
+        file_info: dict with 'name' and 'path' of the saved audio file,
+            and optionally the 'content_hash' computed when it was saved
         
-        # Clean up temp file
-        os.remove(tmp_file_path)
+    Returns:
+        dict: Contains transcript, word_count, status, and error
+    """
+    try:
+        # Reuse the hash taken at upload; only re-read the file without one
+        content_hash = file_info.get('content_hash') or file_sha256(file_info['path'])
+        transcript = _transcribe_cached(
+            content_hash, WHISPER_MODEL, client, file_info['path']
+        )
         
-        return transcript
+        return {
+            "filename": file_info['name'],
+            "transcript": transcript,
+            "word_count": len(transcript.split()) if transcript else 0,
+            "status": "success",
+            "error": None
+        }
         
     except Exception as e:
-        st.error(f"❌ Transcription failed: {str(e)}")
-        return None
+        return {
+            "filename": file_info['name'],
+            "transcript": None,
+            "word_count": 0,
+            "status": "failed",
+            "error": str(e)
+        }
+
+
+def batch_transcribe_audio(file_infos, max_workers=MAX_CONCURRENT_TRANSCRIPTIONS, on_complete=None):
+    """
+    Transcribe multiple audio files concurrently
+    
+    The Whisper calls are network-bound, so they are fanned out over a
+    thread pool and the batch takes roughly as long as the slowest file.
+    
+    Args:
+        file_infos: List of dicts with 'name', 'path' and optional
+            'content_hash' of saved audio files
+        max_workers: Maximum number of simultaneous API requests
+        on_complete: Optional callback(file_info, result), called on the
+            calling thread as each file finishes (safe for st.* calls)
+        
+    Returns:
+        list: Transcription results, in the same order as file_infos
+    """
+    if not file_infos:
+        return []
+    
+    # Resolve the cached client on the script thread, share it with workers
+    client = get_openai_client()
+    results = [None] * len(file_infos)
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(file_infos))) as executor:
+        futures = {
+            executor.submit(_transcribe_file, client, info): index
+            for index, info in enumerate(file_infos)
+        }
+        
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            
+            if on_complete:
+                on_complete(file_infos[index], results[index])
+    
+    return results
+
 
 def get_audio_info(audio_file):
     """
@@ -2,36 +2,39 @@
 Diagnosis generation using GPT-4o-mini with custom medical report format
 """
 
-from openai import OpenAI
 import streamlit as st
-from docx import Document
-from docx.shared import Inches, Pt
 from datetime import datetime
 import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Report model settings
+# The output cap stays at 6000 until real report lengths (logged by
+# _log_usage) show a lower one is safe; a report that reaches it is
+# rejected rather than returned cut off.
+_MODEL = "gpt-4o-mini"
+_TEMPERATURE = 0.2
+_MAX_OUTPUT_TOKENS = 6000
+
+_TRUNCATED_MESSAGE = (
+    f"The report reached the {_MAX_OUTPUT_TOKENS}-token output limit and was cut off. "
+    "Please try again, or shorten the source text."
+)
 
 @st.cache_resource
 def get_openai_client():
     """Initialize OpenAI client"""
+    from openai import OpenAI
+    
     return OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
 
-def generate_diagnosis_from_transcript(transcript):
-    """
-    Generate medical diagnosis from consultation transcript using custom format
-    
-    Args:
-        transcript (str): Transcribed consultation text
-        
-    Returns:
-        str: Formatted medical report text
-    """
-    try:
-        client = get_openai_client()
-        
-        system_prompt = """You are an expert medical scribe.
+# Prompts are built once at import; only the transcript is filled in per call
+_SYSTEM_PROMPT = """You are an expert medical scribe.
 Generate formal medical reports in the exact format provided by the user.
 Follow the template precisely and maintain professional medical documentation standards."""
-        
-        user_prompt = f"""Based on this transcription, create a formal medical report in the following format. 
+
+_USER_PROMPT_TEMPLATE = """Based on this transcription, create a formal medical report in the following format. 
 
 If you did not get the information from the transcription, leave it blank. 
 
@@ -261,17 +264,70 @@ PREVIOUS
 Tab.                                INR
 Date  Mon Tue Wed Thu Fri Sat   Sun
 """
+
+
+def _build_messages(transcript):
+    """
+    Build the chat messages for a diagnosis request
+    
+    Args:
+        transcript (str): Transcribed consultation text
+        
+    Returns:
+        list: System and user messages for the chat completion
+    """
+    return [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "user", "content": _USER_PROMPT_TEMPLATE.format(transcript=transcript)}
+    ]
+
+
+def _log_usage(usage):
+    """Log report token usage, to measure real report lengths"""
+    if usage is None:
+        return
+    
+    logger.info("Diagnosis report: %d completion tokens", usage.completion_tokens)
+
+
+def _check_complete(finish_reason):
+    """
+    Reject a report that stopped at the output cap
+    
+    Args:
+        finish_reason (str): finish_reason of the completion
+        
+    Raises:
+        RuntimeError: If the report was cut off at _MAX_OUTPUT_TOKENS
+    """
+    if finish_reason == "length":
+        logger.warning("Diagnosis report hit max_tokens=%d and was truncated", _MAX_OUTPUT_TOKENS)
+        raise RuntimeError(_TRUNCATED_MESSAGE)
+
+
+def generate_diagnosis_from_transcript(transcript):
+    """
+    Generate medical diagnosis from consultation transcript using custom format
+    
+    Args:
+        transcript (str): Transcribed consultation text
+        
+    Returns:
+        str: Formatted medical report text
+    """
+    try:
+        messages = _build_messages(transcript)
+        client = get_openai_client()
         
         # Call GPT-4o-mini
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.2,
-            max_tokens=6000
+            model=_MODEL,
+            messages=messages,
+            temperature=_TEMPERATURE,
+            max_tokens=_MAX_OUTPUT_TOKENS
         )
+        _log_usage(response.usage)
+        _check_complete(response.choices[0].finish_reason)
         
         # Return plain text formatted report
         return response.choices[0].message.content
@@ -280,6 +336,46 @@ Date  Mon Tue Wed Thu Fri Sat   Sun
         st.error(f"❌ Diagnosis generation failed: {str(e)}")
         return None
 
+
+def generate_diagnosis_stream(transcript):
+    """
+    Stream the medical report as it is generated
+    
+    Same request as generate_diagnosis_from_transcript, but yields text
+    chunks as they arrive so the UI can render them (st.write_stream).
+    API errors propagate to the caller, as does a RuntimeError if the
+    report was cut off at the output cap (the partial text is not kept).
+    
+    Args:
+        transcript (str): Transcribed consultation text
+        
+    Yields:
+        str: Report text chunks
+    """
+    client = get_openai_client()
+    
+    stream = client.chat.completions.create(
+        model=_MODEL,
+        messages=_build_messages(transcript),
+        temperature=_TEMPERATURE,
+        max_tokens=_MAX_OUTPUT_TOKENS,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    
+    finish_reason = None
+    for chunk in stream:
+        if chunk.choices:
+            if chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+        
+        # The final chunk carries usage and no choices
+        if chunk.usage:
+            _log_usage(chunk.usage)
+    
+    _check_complete(finish_reason)
+
 def create_word_document(diagnosis_text, transcript=None):
     """
     Create a Word document from formatted diagnosis text
@@ -289,8 +385,13 @@ def create_word_document(diagnosis_text, transcript=None):
         transcript (str): Optional transcript text
         
     Returns:
-        BytesIO: Word document as bytes
+        bytes: Word document content
     """
+    # python-docx is only needed for downloads, so it is loaded on first use
+    from docx import Document
+    from docx.shared import Inches, Pt
+    from docx.enum.style import WD_STYLE_TYPE
+    
     try:
         # Create document
         doc = Document()
@@ -302,13 +403,16 @@ def create_word_document(diagnosis_text, transcript=None):
             section.left_margin = Inches(0.75)
             section.right_margin = Inches(0.75)
         
-        # Add the pre-formatted diagnosis text directly
-        # Use Courier New for monospaced format (tables align better)
-        for line in diagnosis_text.split('\n'):
-            p = doc.add_paragraph(line)
-            for run in p.runs:
-                run.font.name = 'Courier New'
-                run.font.size = Pt(10)
+        # Use Courier New for monospaced format (tables align better),
+        # defined once as a paragraph style instead of per run
+        mono = doc.styles.add_style('Mono', WD_STYLE_TYPE.PARAGRAPH)
+        mono.base_style = doc.styles['Normal']
+        mono.font.name = 'Courier New'
+        mono.font.size = Pt(10)
+        
+        # Add the pre-formatted diagnosis text directly, as one paragraph:
+        # python-docx turns each '\n' into a line break within the run
+        doc.add_paragraph(diagnosis_text, style=mono)
         
         # Add transcript if provided
         if transcript:
@@ -316,12 +420,11 @@ def create_word_document(diagnosis_text, transcript=None):
             doc.add_heading('CONSULTATION TRANSCRIPT', level=1)
             doc.add_paragraph(transcript)
         
-        # Save to BytesIO
+        # Save to memory; immutable bytes are safe to keep and re-serve
         doc_buffer = io.BytesIO()
         doc.save(doc_buffer)
-        doc_buffer.seek(0)
         
-        return doc_buffer
+        return doc_buffer.getvalue()
         
     except Exception as e:
         st.error(f"❌ Word document creation failed: {str(e)}")
@@ -3,12 +3,57 @@ Chatbot handler for diagnosis refinement
 Uses GPT-4o-mini to interact with doctor and modify diagnosis
 """
 
+import re
 import streamlit as st
-from openai import OpenAI
+from utils.completion_cache import completion_key, get_completion, put_completion
+
+# Chat model settings (also part of the completion cache key).
+# A reply may carry the whole rewritten report in its update block, so
+# the cap is the report cap (diagnosis_generation._MAX_OUTPUT_TOKENS,
+# 6000) plus room for the explanation around it.
+_MODEL = "gpt-4o-mini"
+_TEMPERATURE = 0.3
+_MAX_OUTPUT_TOKENS = 6000 + 1500
+
+# Prompt context budgets, in characters (~4 characters per token)
+_SOURCE_CHAR_LIMIT = 3000
+_HISTORY_CHAR_BUDGET = 6000
+_MAX_HISTORY_MESSAGES = 5
+
+# Most chat messages kept in session state (oldest dropped first)
+MAX_CHAT_HISTORY = 50
+
+# Tags the model wraps a rewritten diagnosis in (see the system prompt)
+_UPDATE_START = "<<DIAGNOSIS_UPDATE>>"
+_UPDATE_END = "<<END_UPDATE>>"
+_UPDATE_RE = re.compile(re.escape(_UPDATE_START) + r"(.*?)" + re.escape(_UPDATE_END), re.DOTALL)
+
+# Shown in the chat in place of the tagged block (the report itself is
+# shown in the diagnosis view)
+_UPDATE_NOTE = "_✏️ Diagnosis updated (see the report view)._"
+_INCOMPLETE_UPDATE_NOTE = "_⚠️ The diagnosis update was cut off and has not been applied._"
+
+# First assistant message of every chat (a constant, so built once)
+_INITIAL_GREETING = """The initial diagnosis is ready for your review. I'm here to collaborate with you on refining it. What aspects would you like to explore or adjust?
+
+I can help you:
+• Modify specific sections of the diagnosis
+• Explain reasoning behind conclusions
+• Add or remove diagnoses
+• Adjust medications or recommendations
+• Answer medical knowledge questions
+• Clarify any contradictions or uncertainties
+
+What would you like to discuss?"""
+
 
 @st.cache_resource
 def get_openai_client():
     """Initialize OpenAI client"""
+    # Imported on first use: app.py loads this module on every run, but
+    # the client is only needed once the chat is opened
+    from openai import OpenAI
+    
     return OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
 
 
@@ -24,23 +69,16 @@ def initialize_chatbot():
 
 def get_initial_greeting():
     """Returns the chatbot's initial greeting message"""
-    return """The initial diagnosis is ready for your review. I'm here to collaborate with you on refining it. What aspects would you like to explore or adjust?
-
-I can help you:
-• Modify specific sections of the diagnosis
-• Explain reasoning behind conclusions
-• Add or remove diagnoses
-• Adjust medications or recommendations
-• Answer medical knowledge questions
-• Clarify any contradictions or uncertainties
-
-What would you like to discuss?"""
+    return _INITIAL_GREETING
 
 
 def add_message(role, content):
     """
     Add a message to chat history
     
+    Only the last MAX_CHAT_HISTORY messages are kept, so a long
+    consultation doesn't grow session state without bound.
+    
     Args:
         role: "user" or "assistant"
         content: Message text
@@ -51,6 +89,11 @@ def add_message(role, content):
         "content": content,
         "timestamp": st.session_state.get('timestamp', None)
     })
+    
+    # Trim in place: callers may hold a reference to the list
+    overflow = len(st.session_state.chat_history) - MAX_CHAT_HISTORY
+    if overflow > 0:
+        del st.session_state.chat_history[:overflow]
 
 
 def get_chat_history():
@@ -65,9 +108,9 @@ def clear_chat():
     st.session_state.chat_modifications = []
 
 
-def generate_chat_response(user_message, current_diagnosis, source_data):
+def _build_chat_messages(user_message, current_diagnosis, source_data):
     """
-    Generate AI response to user message
+    Build the chat completion messages for one turn
     
     Args:
         user_message: User's input
@@ -75,13 +118,10 @@ def generate_chat_response(user_message, current_diagnosis, source_data):
         source_data: Combined source text for context
         
     Returns:
-        str: AI response
+        list: Messages for the chat completions API
     """
-    try:
-        client = get_openai_client()
-        
-        # Build system prompt
-        system_prompt = """You are an expert medical AI assistant helping a doctor refine a diagnostic assessment.
+    # Build system prompt
+    system_prompt = """You are an expert medical AI assistant helping a doctor refine a diagnostic assessment.
 
 Your role:
 - Collaborate with the doctor to improve the diagnosis
@@ -96,6 +136,9 @@ When modifying the diagnosis:
 - Preserve the original format/structure
 - Highlight what you changed
 - Explain your reasoning
+- Wrap ONLY the new complete diagnosis between the exact tokens
+  <<DIAGNOSIS_UPDATE>> and <<END_UPDATE>>; keep explanations outside
+  the block, and omit the block when not modifying the diagnosis
 
 When information is missing:
 - Ask the doctor for clarification
@@ -104,35 +147,91 @@ When information is missing:
 
 Be professional, collaborative, and concise."""
 
-        # Build context for this conversation
-        conversation_context = f"""CURRENT DIAGNOSIS:
+    # Diagnosis and sources go in the system message, ahead of the
+    # changing conversation, so consecutive turns share a long identical
+    # prompt prefix (OpenAI prompt caching bills cached prefixes at a discount)
+    context_prompt = f"""{system_prompt}
+
+CURRENT DIAGNOSIS:
 {current_diagnosis}
 
 SOURCE DATA AVAILABLE:
-{source_data[:3000]}  # Truncate if too long
+{source_data[:_SOURCE_CHAR_LIMIT]}"""
+    
+    # The UI records the new message before requesting a reply; it is
+    # sent last, so leave it out of the history
+    history = st.session_state.chat_history
+    if history and history[-1]['role'] == 'user' and history[-1]['content'] == user_message:
+        history = history[:-1]
+    
+    messages = [{"role": "system", "content": context_prompt}]
+    messages.extend(_recent_history(history))
+    messages.append({"role": "user", "content": user_message})
+    
+    return messages
 
-Previous conversation:
-"""
+
+def _recent_history(history):
+    """
+    Most recent chat turns that fit the history budget
+    
+    Walks back from the newest of the last _MAX_HISTORY_MESSAGES
+    messages. A message that would overflow the remaining character
+    budget (e.g. a full rewritten report) is skipped rather than ending
+    the walk, so the shorter turns around it still give the model its
+    context.
+    
+    Args:
+        history: Chat messages, oldest first
         
-        # Add recent chat history (last 5 messages for context)
-        recent_history = st.session_state.chat_history[-5:] if len(st.session_state.chat_history) > 5 else st.session_state.chat_history
-        for msg in recent_history:
-            conversation_context += f"\n{msg['role'].upper()}: {msg['content']}"
+    Returns:
+        list: Role/content messages for the API, oldest first
+    """
+    recent = []
+    remaining = _HISTORY_CHAR_BUDGET
+    
+    for msg in reversed(history[-_MAX_HISTORY_MESSAGES:]):
+        if len(msg['content']) > remaining:
+            continue
+        remaining -= len(msg['content'])
+        recent.append({"role": msg['role'], "content": msg['content']})
+    
+    recent.reverse()
+    return recent
+
+
+def generate_chat_response(user_message, current_diagnosis, source_data):
+    """
+    Generate AI response to user message
+    
+    Args:
+        user_message: User's input
+        current_diagnosis: Current diagnosis text
+        source_data: Combined source text for context
+        
+    Returns:
+        str: AI response
+    """
+    try:
+        messages = _build_chat_messages(user_message, current_diagnosis, source_data)
+        key = completion_key(_MODEL, messages, temperature=_TEMPERATURE, max_tokens=_MAX_OUTPUT_TOKENS)
         
-        conversation_context += f"\n\nDOCTOR'S NEW REQUEST: {user_message}"
+        cached = get_completion(key)
+        if cached is not None:
+            return cached
+        
+        client = get_openai_client()
         
         # Call GPT-4o-mini
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": conversation_context}
-            ],
-            temperature=0.3,
-            max_tokens=2000
+            model=_MODEL,
+            messages=messages,
+            temperature=_TEMPERATURE,
+            max_tokens=_MAX_OUTPUT_TOKENS
         )
         
         ai_response = response.choices[0].message.content
+        put_completion(key, ai_response)
         
         return ai_response
         
@@ -140,6 +239,50 @@ Previous conversation:
         return f"❌ Error generating response: {str(e)}\n\nPlease try rephrasing your question."
 
 
+def generate_chat_response_stream(user_message, current_diagnosis, source_data):
+    """
+    Stream the AI response to a user message token by token
+    
+    Same prompt and completion cache as generate_chat_response; meant
+    for st.write_stream. A cached reply is yielded in one chunk. Errors
+    propagate to the caller.
+    
+    Args:
+        user_message: User's input
+        current_diagnosis: Current diagnosis text
+        source_data: Combined source text for context
+        
+    Yields:
+        str: Response text chunks as they arrive
+    """
+    messages = _build_chat_messages(user_message, current_diagnosis, source_data)
+    key = completion_key(_MODEL, messages, temperature=_TEMPERATURE, max_tokens=_MAX_OUTPUT_TOKENS)
+    
+    cached = get_completion(key)
+    if cached is not None:
+        yield cached
+        return
+    
+    client = get_openai_client()
+    
+    stream = client.chat.completions.create(
+        model=_MODEL,
+        messages=messages,
+        temperature=_TEMPERATURE,
+        max_tokens=_MAX_OUTPUT_TOKENS,
+        stream=True
+    )
+    
+    parts = []
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield parts[-1]
+    
+    # Only reached when the stream completed (not on errors or early close)
+    put_completion(key, "".join(parts))
+
+
 def extract_diagnosis_update(ai_response, current_diagnosis):
     """
     Extract updated diagnosis from AI response if modification was requested
@@ -151,19 +294,98 @@ def extract_diagnosis_update(ai_response, current_diagnosis):
     Returns:
         str: Updated diagnosis or None if no update
     """
-    # Simple heuristic: if response contains diagnosis-like structure, it's an update
-    # More sophisticated: use another LLM call to extract structured updates
+    # The model tags a rewritten diagnosis explicitly, so a reply that
+    # merely mentions "Name:" or "DIAGNOSIS:" is not taken as an update
+    match = _UPDATE_RE.search(ai_response)
     
-    # Check if AI response contains key diagnosis markers
-    markers = ["DIAGNOSIS:", "MEDICATIONS:", "Name:", "Age:", "SPECIAL RISKS"]
-    
-    if any(marker in ai_response for marker in markers):
-        # Likely contains updated diagnosis
-        return ai_response
+    if match and match.group(1).strip():
+        return match.group(1).strip()
     
     return None
 
 
+def strip_diagnosis_update(ai_response):
+    """
+    Reply text for the chat, with the tagged diagnosis block replaced
+    
+    A complete block becomes a short note; a block that was opened but
+    never closed (e.g. a truncated reply) is cut off with a warning.
+    
+    Args:
+        ai_response: AI's full response text
+        
+    Returns:
+        str: Text to show and keep in the chat history
+    """
+    text = _UPDATE_RE.sub(_UPDATE_NOTE, ai_response)
+    
+    start = text.find(_UPDATE_START)
+    if start != -1:
+        text = text[:start] + _INCOMPLETE_UPDATE_NOTE
+    
+    return text
+
+
+def hide_diagnosis_update(chunks, raw_parts):
+    """
+    Stream reply chunks with the tagged diagnosis block held back
+    
+    Yields the same text strip_diagnosis_update gives for the full
+    reply, as it arrives. Text that might be the start of a tag is held
+    until the next chunk decides it.
+    
+    Args:
+        chunks: Iterable of raw response text chunks
+        raw_parts: List the raw chunks are appended to, so the caller
+            can rebuild the full response for extract_diagnosis_update
+        
+    Yields:
+        str: Displayable text chunks
+    """
+    buffer = ""
+    hidden = False
+    
+    for chunk in chunks:
+        raw_parts.append(chunk)
+        buffer += chunk
+        
+        while True:
+            if hidden:
+                end = buffer.find(_UPDATE_END)
+                if end == -1:
+                    # Keep just enough to spot an end tag split across chunks
+                    buffer = buffer[-(len(_UPDATE_END) - 1):]
+                    break
+                buffer = buffer[end + len(_UPDATE_END):]
+                hidden = False
+                yield _UPDATE_NOTE
+            else:
+                start = buffer.find(_UPDATE_START)
+                if start == -1:
+                    held = _partial_tag_length(buffer, _UPDATE_START)
+                    if len(buffer) > held:
+                        yield buffer[:len(buffer) - held]
+                    buffer = buffer[len(buffer) - held:]
+                    break
+                if start:
+                    yield buffer[:start]
+                buffer = buffer[start + len(_UPDATE_START):]
+                hidden = True
+    
+    if hidden:
+        yield _INCOMPLETE_UPDATE_NOTE
+    elif buffer:
+        yield buffer
+
+
+def _partial_tag_length(text, tag):
+    """Length of the longest end of text that could begin tag"""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
 def apply_diagnosis_modification(modification_text):
     """
     Apply a diagnosis modification from chatbot
@@ -8,18 +8,27 @@ from chatbot_handler.chatbot_handler import (
     get_initial_greeting,
     add_message,
     get_chat_history,
-    generate_chat_response,
+    generate_chat_response_stream,
+    hide_diagnosis_update,
+    strip_diagnosis_update,
     extract_diagnosis_update,
     apply_diagnosis_modification,
     close_chat,
     clear_chat
 )
 
+# Chat messages drawn by default; "Load earlier" reveals this many more
+CHAT_WINDOW = 10
 
+
+@st.fragment
 def render_chatbot_inline(current_diagnosis, source_data):
     """
     Render simple inline chatbot interface on same page
     
+    Runs as a fragment: a chat turn only reruns the chat, unless it
+    changed the diagnosis shown elsewhere on the page.
+    
     Args:
         current_diagnosis: Current diagnosis text
         source_data: Combined source text for context
@@ -36,8 +45,16 @@ def render_chatbot_inline(current_diagnosis, source_data):
         add_message("assistant", greeting)
         chat_history = get_chat_history()
     
-    # Display chat messages
-    for message in chat_history:
+    # Display the most recent chat messages; older ones load on request
+    window = st.session_state.setdefault('chat_window', CHAT_WINDOW)
+    hidden = len(chat_history) - window
+    
+    if hidden > 0:
+        if st.button(f"⬆ Load earlier messages ({hidden} hidden)", key="load_earlier_btn"):
+            st.session_state.chat_window += CHAT_WINDOW
+            st.rerun(scope="fragment")
+    
+    for message in chat_history[-window:]:
         with st.chat_message(message["role"]):
             st.write(message["content"])
     
@@ -51,37 +68,50 @@ def render_chatbot_inline(current_diagnosis, source_data):
         with st.chat_message("user"):
             st.write(user_input)
         
-        # Generate AI response
+        # Generate AI response, rendering tokens as they arrive
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                
-                ai_response = generate_chat_response(
-                    user_input, 
-                    current_diagnosis,
-                    source_data
-                )
-                
+            # The rewritten report is held out of the bubble (it is shown in
+            # the diagnosis view); raw_parts keeps the full reply
+            raw_parts = []
+            try:
+                st.write_stream(hide_diagnosis_update(
+                    generate_chat_response_stream(
+                        user_input, 
+                        current_diagnosis,
+                        source_data
+                    ),
+                    raw_parts
+                ))
+                ai_response = "".join(raw_parts)
+            except Exception as e:
+                ai_response = f"❌ Error generating response: {str(e)}\n\nPlease try rephrasing your question."
                 st.write(ai_response)
-                
-                # Check if this is a diagnosis modification
-                updated_diagnosis = extract_diagnosis_update(ai_response, current_diagnosis)
-                
-                if updated_diagnosis:
-                    st.success("✅ Diagnosis updated!")
-                    apply_diagnosis_modification(updated_diagnosis)
-                
-                # Add AI response to history
-                add_message("assistant", ai_response)
+            
+            # Check if this is a diagnosis modification
+            updated_diagnosis = extract_diagnosis_update(ai_response, current_diagnosis)
+            
+            if updated_diagnosis:
+                st.success("✅ Diagnosis updated!")
+                apply_diagnosis_modification(updated_diagnosis)
+            
+            # Add AI response to history, without the tagged report
+            add_message("assistant", strip_diagnosis_update(ai_response))
         
-        st.rerun()
+        # The new turn is already on screen; only a diagnosis change needs
+        # the rest of the page redrawn
+        if updated_diagnosis:
+            st.rerun(scope="app")
     
     # Action buttons below chat
     col1, col2 = st.columns(2)
     
     with col1:
         if st.button("🔄 Clear Chat", key="clear_chat_btn", use_container_width=True):
+            # Modification count is shown above the chat, refresh it too
+            had_modifications = bool(st.session_state.chat_modifications)
             clear_chat()
-            st.rerun()
+            st.session_state.chat_window = CHAT_WINDOW
+            st.rerun(scope="app" if had_modifications else "fragment")
     
     with col2:
         if st.button("✅ Done, Finalize Report", key="finalize_btn", type="primary", use_container_width=True):
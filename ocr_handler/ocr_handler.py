@@ -5,8 +5,50 @@ OCR text extraction using Qwen2.5-VL via API
 import streamlit as st
 import requests
 import base64
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PIL import Image
 import io
+from utils.hashing import uploaded_file_sha256
+from utils.backoff import retry
+
+# Upper bound on simultaneous OCR requests (OpenRouter rate limits)
+MAX_CONCURRENT_REQUESTS = 8
+
+# Vision model used for OCR (part of the OCR cache key)
+OCR_MODEL = "qwen/qwen-2.5-vl-7b-instruct"
+
+# Longest image side sent to the vision model (larger scans are downscaled)
+MAX_IMAGE_DIMENSION = 2048
+
+# JPEG quality for re-encoded images (OCR accuracy holds well above this)
+JPEG_QUALITY = 85
+
+# Rule between documents in combined OCR text
+_SEP = '=' * 60
+
+# OCR cache bounds: entries kept (oldest evicted first) and seconds
+# each entry lives, so patient text doesn't linger in memory
+MAX_CACHED_OCR_RESULTS = 1000
+OCR_CACHE_TTL = 3600
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_session():
+    """
+    Shared HTTP session for OCR requests
+    
+    Keep-alive connections are pooled (one per concurrent worker), so
+    batch OCR pays the TCP/TLS handshake once per connection instead of
+    once per image. Safe to call from worker threads (no spinner).
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=MAX_CONCURRENT_REQUESTS
+    )
+    session.mount("https://", adapter)
+    return session
+
 
 def encode_image_to_base64(image_file):
     """
@@ -17,18 +59,32 @@ def encode_image_to_base64(image_file):
         
     Returns:
         str: Base64 encoded image
+        
+    Raises:
+        ValueError: If the file can't be read as an image (the message
+            says why, for the caller to report; this runs in worker
+            threads, where st.error would be dropped)
     """
     try:
-        # Open and convert image
+        # Open image (reads the header only; pixels decode on first use)
         image = Image.open(image_file)
         
+        # RGB JPEGs within the size limit are sent as uploaded: no
+        # decode/re-encode, and no second round of JPEG artifacts
+        if (image.format == 'JPEG' and image.mode == 'RGB'
+                and max(image.size) <= MAX_IMAGE_DIMENSION):
+            return base64.b64encode(image_file.getvalue()).decode('utf-8')
+        
         # Convert to RGB if necessary (handle RGBA, grayscale, etc.)
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
+        # Downscale oversized scans (in place, keeps aspect ratio)
+        image.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.Resampling.LANCZOS)
+        
         # Save to bytes buffer
         buffered = io.BytesIO()
-        image.save(buffered, format="JPEG", quality=95)
+        image.save(buffered, format="JPEG", quality=JPEG_QUALITY, optimize=True)
         
         # Encode to base64
         img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
@@ -36,8 +92,79 @@ def encode_image_to_base64(image_file):
         return img_base64
         
     except Exception as e:
-        st.error(f"Image encoding failed: {str(e)}")
-        return None
+        raise ValueError(f"Image encoding failed: {str(e)}") from e
+
+
+@st.cache_data(max_entries=MAX_CACHED_OCR_RESULTS, ttl=OCR_CACHE_TTL, show_spinner=False)
+def _extract_text_cached(content_hash, prompt, model, _image_file, _api_key):
+    """
+    OCR API call cached in memory by image content hash, prompt and model
+    
+    The same image (even renamed or re-uploaded) is not sent to the API
+    again. Nothing is written to disk: entries live only in this server
+    process. A hit needs the exact same image bytes, so a session can
+    only get back text for a file it uploaded itself. Transient errors
+    are retried with backoff; errors that remain raise, so failures are
+    never cached.
+    Underscore arguments are excluded from the cache key.
+    
+    Args:
+        content_hash: SHA-256 of the image content
+        prompt: OCR instruction
+        model: OpenRouter model ID
+        _image_file: Streamlit UploadedFile object
+        _api_key: OpenRouter API key
+        
+    Returns:
+        str: Extracted text
+    """
+    # Encode image to base64
+    base64_image = encode_image_to_base64(_image_file)
+    
+    # API endpoint (OpenRouter)
+    url = "https://openrouter.ai/api/v1/chat/completions"
+    
+    headers = {
+        "Authorization": f"Bearer {_api_key}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://your-app-url.streamlit.app",  # Optional
+        "X-Title": "Medical Diagnostic Tool"  # Optional
+    }
+    
+    payload = {
+        "model": model,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{base64_image}"
+                        }
+                    }
+                ]
+            }
+        ],
+        "max_tokens": 3000,
+        "temperature": 0.1
+    }
+    
+    def request():
+        response = get_http_session().post(url, headers=headers, json=payload, timeout=60)
+        response.raise_for_status()
+        return response
+    
+    # Make API request
+    response = retry(request)
+    
+    # Parse response
+    result = response.json()
+    return result['choices'][0]['message']['content']
 
 
 def extract_text_from_image(image_file, api_key, prompt=None):
@@ -68,58 +195,9 @@ Pay special attention to:
 Preserve the original formatting and organization."""
     
     try:
-        # Encode image to base64
-        base64_image = encode_image_to_base64(image_file)
-        
-        if not base64_image:
-            return {
-                "filename": image_file.name,
-                "extracted_text": None,
-                "status": "failed",
-                "error": "Image encoding failed",
-                "word_count": 0
-            }
-        
-        # API endpoint (OpenRouter)
-        url = "https://openrouter.ai/api/v1/chat/completions"
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://your-app-url.streamlit.app",  # Optional
-            "X-Title": "Medical Diagnostic Tool"  # Optional
-        }
-        
-        payload = {
-            "model": "qwen/qwen-2.5-vl-7b-instruct",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            "max_tokens": 3000,
-            "temperature": 0.1
-        }
-        
-        # Make API request
-        response = requests.post(url, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        
-        # Parse response
-        result = response.json()
-        extracted_text = result['choices'][0]['message']['content']
+        extracted_text = _extract_text_cached(
+            uploaded_file_sha256(image_file), prompt, OCR_MODEL, image_file, api_key
+        )
         
         return {
             "filename": image_file.name,
@@ -187,28 +265,45 @@ Be precise and extract exact values as they appear."""
     return extract_text_from_image(image_file, api_key, prompt)
 
 
-def batch_extract_from_images(image_files, api_key, mode="full", fields=None):
+def batch_extract_from_images(image_files, api_key, mode="full", fields=None,
+                              max_workers=MAX_CONCURRENT_REQUESTS, on_complete=None):
     """
-    Process multiple images for OCR
+    Process multiple images for OCR concurrently
     
     Args:
         image_files: List of Streamlit UploadedFile objects
         api_key: OpenRouter API key
         mode: "full" or "structured"
         fields: List of fields (for structured mode)
+        max_workers: Maximum number of simultaneous API requests
+        on_complete: Optional callback(result), called on the calling
+            thread as each image finishes (safe for st.* calls)
         
     Returns:
-        list: List of extraction results
+        list: List of extraction results, in the same order as image_files
     """
-    results = []
+    if not image_files:
+        return []
     
-    for image_file in image_files:
+    def extract(image_file):
         if mode == "structured" and fields:
-            result = extract_structured_fields(image_file, api_key, fields)
-        else:
-            result = extract_text_from_image(image_file, api_key)
+            return extract_structured_fields(image_file, api_key, fields)
+        return extract_text_from_image(image_file, api_key)
+    
+    results = [None] * len(image_files)
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(image_files))) as executor:
+        futures = {
+            executor.submit(extract, image_file): index
+            for index, image_file in enumerate(image_files)
+        }
         
-        results.append(result)
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            
+            if on_complete:
+                on_complete(results[index])
     
     return results
 
@@ -223,12 +318,9 @@ def get_combined_text(ocr_results):
     Returns:
         str: Combined text from all documents
     """
-    combined = []
-    
-    for result in ocr_results:
-        if result['status'] == 'success' and result['extracted_text']:
-            combined.append(f"\n{'='*60}\nFILE: {result['filename']}\n{'='*60}\n")
-            combined.append(result['extracted_text'])
-            combined.append("\n")
-    
-    return "\n".join(combined)
+    # One string per document, joined in a single pass
+    return "\n".join(
+        f"\n{_SEP}\nFILE: {result['filename']}\n{_SEP}\n\n{result['extracted_text']}\n\n"
+        for result in ocr_results
+        if result['status'] == 'success' and result['extracted_text']
+    )
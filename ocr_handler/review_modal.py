@@ -57,8 +57,12 @@ def show_review_modal(source_id):
     if edited_text != source['raw_text']:
         st.warning("⚠️ You have made changes to the original text")
     
-    # Character/word count
-    st.caption(f"Characters: {len(edited_text)} | Words: {len(edited_text.split())}")
+    # Character/word count (the stored count is current until the text is edited)
+    if edited_text == source['edited_text']:
+        word_count = source['word_count']
+    else:
+        word_count = len(edited_text.split())
+    st.caption(f"Characters: {len(edited_text)} | Words: {word_count}")
     
     st.markdown("---")
     
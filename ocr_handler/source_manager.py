@@ -4,88 +4,211 @@ Handles review, editing, and confirmation workflow
 """
 
 import streamlit as st
+from collections import namedtuple
 from datetime import datetime
 
 
+# Source review statuses (shared with the UI)
+STATUS_PENDING = "pending"
+STATUS_CONFIRMED = "confirmed"
+
+# Rule framing each source header in the combined text
+_SEP = "=" * 60
+
+# Format of created_at / confirmed_at
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Everything the UI derives from the source list, computed in one pass
+SourceState = namedtuple("SourceState", ["sources", "summary", "confirmed", "all_confirmed"])
+
+
 def initialize_source_manager():
     """Initialize session state for source management"""
+    # Called by every public function; after the first call one lookup
+    # replaces the per-key checks below
+    if st.session_state.get('source_manager_initialized'):
+        return
+    
     if 'sources' not in st.session_state:
         st.session_state.sources = []
     if 'review_mode' not in st.session_state:
-        st.session_state.review_mode = None  # Stores index of source being reviewed
+        st.session_state.review_mode = None  # Stores ID of source being reviewed
+    if 'sources_version' not in st.session_state:
+        st.session_state.sources_version = 0  # Bumped on every source mutation
+    if 'combined_text_cache' not in st.session_state:
+        st.session_state.combined_text_cache = None  # (sources_version, text)
+    if 'source_state_cache' not in st.session_state:
+        st.session_state.source_state_cache = None  # (sources_version, SourceState)
+    if 'sources_by_id' not in st.session_state:
+        # Same dicts as the sources list, for O(1) lookup by ID
+        st.session_state.sources_by_id = {s["id"]: s for s in st.session_state.sources}
+    if 'next_source_id' not in st.session_state:
+        # IDs are never reused, even after discards
+        st.session_state.next_source_id = max(st.session_state.sources_by_id, default=-1) + 1
+    
+    st.session_state.source_manager_initialized = True
 
 
-def add_source(source_type, filename, raw_text, metadata=None):
+def _timestamp():
+    """Current time formatted for created_at / confirmed_at"""
+    return datetime.now().strftime(_TIMESTAMP_FORMAT)
+
+
+def _count_words(text):
+    """Whitespace-delimited word count (split() runs in C)"""
+    return len(text.split()) if text else 0
+
+
+def _mark_sources_changed():
+    """Invalidate values derived from the source list"""
+    st.session_state.sources_version += 1
+
+
+def _memoize_on_version(cache_key, compute):
     """
-    Add a new source to the system
+    Return compute() memoized in session_state per sources_version
+    
+    Session state (not st.cache_data) keeps the value per session, since
+    the sources are one doctor's patient data.
     
     Args:
-        source_type: "ocr", "audio", "manual"
-        filename: Name of the source file
-        raw_text: Original extracted/transcribed text
-        metadata: Additional info (word_count, file_size, etc.)
+        cache_key: session_state key holding (sources_version, value)
+        compute: Zero-argument function building the value
         
     Returns:
-        int: Index of added source
+        The cached or freshly computed value
     """
-    initialize_source_manager()
+    version = st.session_state.sources_version
+    cached = st.session_state.get(cache_key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
     
-    source = {
-        "id": len(st.session_state.sources),
+    value = compute()
+    st.session_state[cache_key] = (version, value)
+    return value
+
+
+def _source_header(filename, source_type):
+    """Header line introducing a source in the combined text"""
+    return f"SOURCE: {filename} ({source_type.upper()})"
+
+
+def _new_source(source_id, created_at, source_type, filename, raw_text, metadata=None):
+    """Build a pending source dict (word count reused from metadata if given)"""
+    metadata = metadata or {}
+    word_count = metadata.get("word_count")
+    if word_count is None:
+        word_count = _count_words(raw_text)
+    
+    return {
+        "id": source_id,
         "type": source_type,
         "filename": filename,
         "raw_text": raw_text,
         "edited_text": raw_text,  # Start with raw text
-        "status": "pending",  # pending, confirmed, discarded
-        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "status": STATUS_PENDING,  # STATUS_PENDING or STATUS_CONFIRMED
+        "created_at": created_at,
         "confirmed_at": None,
-        "metadata": metadata or {},
-        "word_count": len(raw_text.split()) if raw_text else 0
+        "metadata": metadata,
+        "word_count": word_count,
+        "header": _source_header(filename, source_type)  # filename/type never change
     }
+
+
+def add_source(source_type, filename, raw_text, metadata=None):
+    """
+    Add a new source to the system
+    
+    Args:
+        source_type: "ocr", "audio", "manual"
+        filename: Name of the source file
+        raw_text: Original extracted/transcribed text
+        metadata: Additional info (file_size, etc.); a precomputed
+            word_count here is reused instead of recounting raw_text
+        
+    Returns:
+        int: ID of added source
+    """
+    return add_sources_bulk([{
+        "source_type": source_type,
+        "filename": filename,
+        "raw_text": raw_text,
+        "metadata": metadata
+    }])[0]
+
+
+def add_sources_bulk(items):
+    """
+    Add several sources at once, invalidating derived state only once
+    
+    Args:
+        items: List of dicts with add_source's arguments
+            (source_type, filename, raw_text, optional metadata)
+        
+    Returns:
+        list: IDs of the added sources, in order
+    """
+    initialize_source_manager()
+    sources = st.session_state.sources
+    sources_by_id = st.session_state.sources_by_id
+    
+    # One timestamp for the whole batch: these sources arrived together
+    created_at = _timestamp()
+    
+    # IDs are taken from a local copy of the counter, which is written
+    # back to session state once after the loop
+    first_id = st.session_state.next_source_id
+    
+    new_ids = []
+    for source_id, item in enumerate(items, start=first_id):
+        source = _new_source(source_id, created_at, **item)
+        sources.append(source)
+        sources_by_id[source_id] = source
+        new_ids.append(source_id)
     
-    st.session_state.sources.append(source)
-    return source["id"]
+    if new_ids:
+        st.session_state.next_source_id = first_id + len(new_ids)
+        _mark_sources_changed()
+    return new_ids
 
 
 def get_source_by_id(source_id):
     """Get source by ID"""
     initialize_source_manager()
-    for source in st.session_state.sources:
-        if source["id"] == source_id:
-            return source
-    return None
+    return st.session_state.sources_by_id.get(source_id)
 
 
 def update_source_text(source_id, new_text):
-    """Update edited text for a source"""
-    initialize_source_manager()
-    for source in st.session_state.sources:
-        if source["id"] == source_id:
-            source["edited_text"] = new_text
-            source["word_count"] = len(new_text.split())
-            break
+    """Update edited text for a source (no-op if the text is unchanged)"""
+    source = get_source_by_id(source_id)
+    if source is None or source["edited_text"] == new_text:
+        return
+    
+    source["edited_text"] = new_text
+    source["word_count"] = _count_words(new_text)
+    _mark_sources_changed()
 
 
 def confirm_source(source_id):
     """Mark source as confirmed"""
-    initialize_source_manager()
-    for source in st.session_state.sources:
-        if source["id"] == source_id:
-            source["status"] = "confirmed"
-            source["confirmed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            break
+    source = get_source_by_id(source_id)
+    if source is not None:
+        source["status"] = STATUS_CONFIRMED
+        source["confirmed_at"] = _timestamp()
+        _mark_sources_changed()
 
 
 def discard_source(source_id):
     """Remove source from system"""
     initialize_source_manager()
-    st.session_state.sources = [
-        s for s in st.session_state.sources if s["id"] != source_id
-    ]
+    source = st.session_state.sources_by_id.pop(source_id, None)
+    if source is not None:
+        st.session_state.sources.remove(source)
+        _mark_sources_changed()
 
 
 def get_all_sources():
-    """Get all sources"""
+    """Get all sources (the live list, not a copy; use the mutators to change it)"""
     initialize_source_manager()
     return st.session_state.sources
 
@@ -93,79 +216,118 @@ def get_all_sources():
 def get_pending_sources():
     """Get sources pending review"""
     initialize_source_manager()
-    return [s for s in st.session_state.sources if s["status"] == "pending"]
+    return [s for s in st.session_state.sources if s["status"] == STATUS_PENDING]
 
 
 def get_confirmed_sources():
     """Get confirmed sources"""
     initialize_source_manager()
-    return [s for s in st.session_state.sources if s["status"] == "confirmed"]
+    return [s for s in st.session_state.sources if s["status"] == STATUS_CONFIRMED]
 
 
 def all_sources_confirmed():
-    """Check if all sources are confirmed"""
-    initialize_source_manager()
-    if not st.session_state.sources:
-        return False
-    return all(s["status"] == "confirmed" for s in st.session_state.sources)
+    """Check if all sources are confirmed (read from the memoized state)"""
+    return get_source_state().all_confirmed
 
 
 def get_combined_text():
-    """Get all confirmed source texts combined"""
-    confirmed = get_confirmed_sources()
-    
-    if not confirmed:
-        return ""
-    
-    combined = []
-    for source in confirmed:
-        combined.append(f"\n{'='*60}")
-        combined.append(f"SOURCE: {source['filename']} ({source['type'].upper()})")
-        combined.append(f"{'='*60}\n")
-        combined.append(source['edited_text'])
-        combined.append("\n")
+    """
+    Get all confirmed source texts combined
     
-    return "\n".join(combined)
+    The result is memoized per sources_version, so reruns that don't
+    touch the sources reuse the previous string.
+    """
+    initialize_source_manager()
+    return _memoize_on_version(
+        'combined_text_cache',
+        lambda: _build_combined_text(get_source_state().confirmed)
+    )
 
 
-def get_source_summary():
-    """Get summary statistics of all sources"""
-    initialize_source_manager()
+def _build_combined_text(confirmed):
+    """Concatenate confirmed sources under per-source headers"""
+    # One string per source, joined in a single pass (sources added
+    # before headers were stored get theirs built here)
+    return "\n".join(
+        f"\n{_SEP}\n{source.get('header') or _source_header(source['filename'], source['type'])}\n{_SEP}\n\n"
+        f"{source['edited_text']}\n\n"
+        for source in confirmed
+    )
+
+
+def get_source_state():
+    """
+    Get sources, summary, confirmed sources and all-confirmed flag together
     
-    sources = st.session_state.sources
-    confirmed = get_confirmed_sources()
-    pending = get_pending_sources()
+    Computed in a single pass over the sources and memoized per
+    sources_version, so repeated reads within and across reruns are O(1).
     
-    total_words = sum(s['word_count'] for s in confirmed)
+    Returns:
+        SourceState: (sources, summary, confirmed, all_confirmed)
+    """
+    initialize_source_manager()
+    return _memoize_on_version(
+        'source_state_cache',
+        lambda: _compute_source_state(st.session_state.sources)
+    )
+
+
+def _compute_source_state(sources):
+    """Single pass over sources building the SourceState"""
+    confirmed = []
+    pending = 0
+    total_words = 0
+    by_type = {'ocr': 0, 'audio': 0, 'manual': 0}
     
-    return {
+    for source in sources:
+        if source['status'] == STATUS_CONFIRMED:
+            confirmed.append(source)
+            total_words += source['word_count']
+            by_type[source['type']] = by_type.get(source['type'], 0) + 1
+        elif source['status'] == STATUS_PENDING:
+            pending += 1
+    
+    summary = {
         'total_sources': len(sources),
         'confirmed': len(confirmed),
-        'pending': len(pending),
+        'pending': pending,
         'total_words': total_words,
-        'by_type': {
-            'ocr': len([s for s in confirmed if s['type'] == 'ocr']),
-            'audio': len([s for s in confirmed if s['type'] == 'audio']),
-            'manual': len([s for s in confirmed if s['type'] == 'manual'])
-        }
+        'by_type': by_type
     }
+    
+    all_confirmed = bool(sources) and len(confirmed) == len(sources)
+    
+    return SourceState(sources, summary, confirmed, all_confirmed)
+
+
+def get_source_summary():
+    """Get summary statistics of all sources"""
+    return get_source_state().summary
 
 
 def bulk_confirm_all():
     """Confirm all pending sources at once"""
     initialize_source_manager()
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = _timestamp()
+    confirmed_any = False
     
     for source in st.session_state.sources:
-        if source["status"] == "pending":
-            source["status"] = "confirmed"
+        if source["status"] == STATUS_PENDING:
+            source["status"] = STATUS_CONFIRMED
             source["confirmed_at"] = timestamp
+            confirmed_any = True
+    
+    if confirmed_any:
+        _mark_sources_changed()
 
 
 def clear_all_sources():
     """Remove all sources"""
+    initialize_source_manager()
     st.session_state.sources = []
+    st.session_state.sources_by_id = {}
     st.session_state.review_mode = None
+    _mark_sources_changed()
 
 
 def open_review_modal(source_id):
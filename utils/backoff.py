@@ -0,0 +1,92 @@
+"""
+Retry with exponential backoff and jitter for rate-limited API calls
+"""
+
+import random
+import time
+
+# HTTP statuses worth retrying (rate limit and transient server errors)
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _status_code(error):
+    """
+    HTTP status carried by an API exception, if any
+    
+    Covers OpenAI SDK errors (status_code) and requests' HTTPError
+    (response.status_code).
+    """
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None)
+    return status
+
+
+def _is_transient(error):
+    """
+    Whether an API exception is worth retrying
+    
+    Rate limits and transient server errors (by status), plus dropped
+    connections and timeouts, which carry no status. The SDKs are
+    imported here rather than at module load, so callers that never
+    use OpenAI don't pay for importing it.
+    """
+    if _status_code(error) in RETRYABLE_STATUSES:
+        return True
+    
+    import openai
+    import requests
+    
+    return isinstance(error, (
+        openai.APIConnectionError,  # includes APITimeoutError
+        requests.ConnectionError,
+        requests.Timeout
+    ))
+
+
+def _retry_after(error):
+    """
+    Delay in seconds requested by the server's Retry-After header, if any
+    
+    Only the delta-seconds form is used; an HTTP-date value is ignored
+    and the regular backoff applies.
+    """
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return max(0.0, float(headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return None
+
+
+def retry(fn, max_retries=5, base=1.0, cap=30.0):
+    """
+    Call fn, retrying on rate limits, transient server errors, dropped
+    connections and timeouts
+    
+    Sleeps min(cap, base * 2**attempt) plus up to `base` seconds of
+    jitter between attempts, so concurrent workers don't retry in
+    lockstep. A longer Retry-After from the server (up to `cap`) takes
+    precedence. Other errors, and the last failure, are re-raised.
+    
+    Args:
+        fn: Zero-argument callable making the API request
+        max_retries: Retries after the first attempt
+        base: Base delay in seconds
+        cap: Maximum backoff delay in seconds (before jitter)
+        
+    Returns:
+        Whatever fn returns
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_retries or not _is_transient(e):
+                raise
+            
+            delay = min(cap, base * 2 ** attempt)
+            retry_after = _retry_after(e)
+            if retry_after is not None:
+                delay = max(delay, min(cap, retry_after))
+            time.sleep(delay + random.uniform(0, base))
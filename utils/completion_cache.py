@@ -0,0 +1,83 @@
+"""
+Per-session LRU cache for LLM completions, keyed on the full request
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+# Completions kept per session (oldest evicted first), and seconds each
+# one can be reused before it is requested again
+MAX_CACHED_COMPLETIONS = 32
+COMPLETION_TTL = 3600
+
+
+def _completion_store():
+    """
+    This session's OrderedDict of key -> (stored_at, text)
+    
+    Kept in session state, not a process-wide resource: entries hold
+    chat replies about a patient's report, so one session's cache must
+    never be visible to another. Only called from the script thread.
+    """
+    return st.session_state.setdefault('completion_cache', OrderedDict())
+
+
+def completion_key(model, messages, **params):
+    """
+    Stable key for a chat completion request
+    
+    Args:
+        model: Model name
+        messages: Chat messages list
+        **params: Other generation parameters (temperature, max_tokens, ...)
+        
+    Returns:
+        str: Hex digest identifying the request
+    """
+    payload = json.dumps([model, messages, params], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_completion(key):
+    """
+    Cached completion text for a key, or None
+    
+    Entries older than COMPLETION_TTL count as a miss and are dropped.
+    
+    Args:
+        key: Key from completion_key
+        
+    Returns:
+        str: Cached text, or None on a miss
+    """
+    store = _completion_store()
+    entry = store.get(key)
+    if entry is None:
+        return None
+    
+    stored_at, text = entry
+    if time.monotonic() - stored_at > COMPLETION_TTL:
+        del store[key]
+        return None
+    
+    store.move_to_end(key)
+    return text
+
+
+def put_completion(key, text):
+    """
+    Store a completed response, evicting the least recently used entry
+    
+    Args:
+        key: Key from completion_key
+        text: Full completion text
+    """
+    store = _completion_store()
+    store[key] = (time.monotonic(), text)
+    store.move_to_end(key)
+    while len(store) > MAX_CACHED_COMPLETIONS:
+        store.popitem(last=False)
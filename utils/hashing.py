@@ -0,0 +1,79 @@
+"""
+Content hashing for uploaded and saved files (cache and dedup keys)
+"""
+
+import hashlib
+import os
+import tempfile
+
+# Read size for hashing files on disk
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path):
+    """
+    SHA-256 of a file on disk, read in blocks
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        str: Hex digest
+    """
+    with open(file_path, 'rb') as f:
+        # Python 3.11+: OpenSSL reads and hashes without a Python-level loop
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        
+        hasher = hashlib.sha256()
+        while block := f.read(HASH_BLOCK_SIZE):
+            hasher.update(block)
+    
+    return hasher.hexdigest()
+
+
+def uploaded_file_sha256(uploaded_file):
+    """
+    SHA-256 of a Streamlit UploadedFile's content
+    
+    Args:
+        uploaded_file: Streamlit UploadedFile object
+        
+    Returns:
+        str: Hex digest
+    """
+    # getbuffer() is a zero-copy view; getvalue() would copy the whole upload
+    return hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+
+
+def save_by_sha256(uploaded_file, directory):
+    """
+    Write an upload to disk under its content hash
+    
+    UploadedFile is already an in-memory BytesIO, so its buffer is
+    hashed and written directly (zero-copy) instead of being read out
+    in Python-level chunks. The file is named after the hash (keeping
+    the upload's extension, which Whisper uses to detect the format),
+    so uploads with the same name from different sessions never share
+    a path, and a given path always holds the bytes its name hashes to.
+    
+    Args:
+        uploaded_file: Streamlit UploadedFile object
+        directory: Destination directory
+        
+    Returns:
+        tuple: (file_path, hex digest of the written content)
+    """
+    buffer = uploaded_file.getbuffer()
+    content_hash = hashlib.sha256(buffer).hexdigest()
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    file_path = os.path.join(directory, content_hash + extension)
+    
+    # Written beside the target and renamed into place, so a concurrent
+    # reader of the same hash never sees a partly written file
+    fd, partial_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(buffer)
+    os.replace(partial_path, file_path)
+    
+    return file_path, content_hash
@@ -0,0 +1,65 @@
+"""
+Shared CSS and static HTML blocks for the Streamlit UI
+"""
+
+import streamlit as st
+
+# Built once at import; every rerun re-emits the same interned string
+APP_CSS = """
+<style>
+.block-container {
+    padding-top: 3rem !important;
+    padding-bottom: 2rem !important;
+}
+.greeting {
+    font-size: 4rem !important;
+    color: #1f77b4;
+    font-weight: 800;
+    margin-bottom: 0px;
+    line-height: 1.2;
+}
+.sub-greeting {
+    font-size: 1.8rem !important;
+    color: #4a4a4a;
+    font-weight: 300;
+    margin-top: 0px;
+    margin-bottom: 3rem;
+}
+.disclaimer-box {
+    margin-top: 3rem;
+    padding: 1rem;
+    background-color: #fff3cd;
+    border: 1px solid #ffeeba;
+    color: #856404;
+    border-radius: 0.25rem;
+    font-size: 0.9rem;
+    text-align: center;
+}
+</style>
+"""
+
+# Footer disclaimer (styled by .disclaimer-box above)
+DISCLAIMER_HTML = """
+<div class="disclaimer-box">
+    <strong>⚠️ DISCLAIMER: AI-Assisted Diagnosis</strong><br>
+    This diagnosis is generated by Artificial Intelligence and is subject to potential inaccuracies. 
+    It is designed to function <strong>solely as a decision support tool</strong>. 
+    It does not replace professional medical judgment. 
+</div>
+"""
+
+
+def inject_styles():
+    """
+    Inject the app-wide CSS
+    
+    Must run on every full rerun: Streamlit removes elements that a
+    rerun does not re-emit, so injecting once per session would drop
+    the styles after the first interaction.
+    """
+    st.markdown(APP_CSS, unsafe_allow_html=True)
+
+
+def render_disclaimer():
+    """Render the AI-assistance disclaimer footer"""
+    st.markdown(DISCLAIMER_HTML, unsafe_allow_html=True)